@@ -4,11 +4,13 @@ import os
 from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.security import generate_password_hash
 from .auth import Auth, is_api_request
+from .json_provider import ORJSONProvider
 from .ai_upscale import configure_ai_upscale_app
 from .validators import format_file_size_label
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_wtf.csrf import CSRFProtect, CSRFError
 from flask_limiter.errors import RateLimitExceeded as LimiterRateLimitExceeded
+from PIL import features
 
 def _read_version():
     for path in ('VERSION', os.path.join(os.path.dirname(__file__), '..', 'VERSION')):
@@ -26,6 +28,7 @@ def _get_rate_limit(env_name, default):
 
 def create_app():
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
 
     # Load environment variables from .env file
     load_dotenv()
@@ -42,6 +45,11 @@ def create_app():
     app.logger.addHandler(handler)
     app.logger.setLevel(log_level)
 
+    # Pillow's wheels bundle SIMD libjpeg-turbo; a source build linked against
+    # plain libjpeg makes every JPEG decode/encode several times slower.
+    if not features.check_feature('libjpeg_turbo'):
+        app.logger.warning("Pillow is not built with libjpeg-turbo; JPEG processing will be slower")
+
     # Get password from environment
     env_password = os.getenv('APP_PASSWORD')
     if not env_password:
@@ -180,8 +188,9 @@ def create_app():
     app.jinja_env.globals['app_version'] = _read_version()
 
     # Register blueprints
-    from app.routes import main
+    from app.routes import main, configure_compression_app
     app.register_blueprint(main)
+    configure_compression_app(app)
 
     # Apply rate limits to routes (must store wrapped function back)
     limiter = app.limiter
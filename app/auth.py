@@ -95,7 +95,7 @@ class Auth:
             is_valid = check_password_hash(env_hash, password)
 
             if is_valid:
-                current_app.logger.info(f"Successful login from {ip}")
+                current_app.logger.info("Successful login from %s", ip)
                 # Clear pre-login session data to prevent session fixation.
                 # For cookie-based sessions this is sufficient; server-side
                 # session backends would also need ID regeneration.
@@ -105,12 +105,12 @@ class Auth:
                 self._reset_attempts(ip)
                 return True
 
-            current_app.logger.warning(f"Failed login attempt from {ip}")
+            current_app.logger.warning("Failed login attempt from %s", ip)
             self._record_failed_attempt(ip)
             return False
 
         except Exception as e:
-            current_app.logger.error(f"Authentication error from {ip}: {e}")
+            current_app.logger.error("Authentication error from %s: %s", ip, e)
             return False
 
     def _is_locked_out(self, ip):
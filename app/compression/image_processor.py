@@ -1,14 +1,17 @@
-from PIL import Image, ImageOps, ImageCms, ImageDraw, ImageFont
+from PIL import Image, ImageOps, ImageCms, ImageDraw, ImageFont, ExifTags
 import io
 import logging
 import threading
 from pathlib import Path
 from functools import lru_cache
-from typing import Tuple, Dict, Optional, List
+from typing import BinaryIO, Tuple, Dict, Optional, List, Union
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Raw image bytes, or a seekable binary stream such as an upload's file.stream
+ImageSource = Union[bytes, BinaryIO]
+
 
 class CompressionError(Exception):
     """Base class for compression-related errors"""
@@ -43,6 +46,15 @@ class ValidationResult:
     image: Optional[Image.Image] = None  # Return the opened image to avoid reopening
 
 
+@dataclass
+class ProcessResult:
+    is_valid: bool
+    errors: List[str]
+    warnings: List[str]  # Validation warnings followed by format warnings
+    data: Optional[bytes] = None
+    metadata: Optional[Dict] = None
+
+
 @dataclass(frozen=True)
 class ResizePlan:
     mode: str
@@ -59,16 +71,38 @@ class ResizePlan:
 class ImageCompressor:
     _FONT_PATH = Path(__file__).parent / 'fonts' / 'Inter-SemiBold.ttf'
     MAX_PIXELS = 40_000_000  # ~8000×5000 — reject to prevent decompression bombs
+    _EXIF_TRANSPOSE_ORIENTATIONS = frozenset(range(2, 9))
+    _EXIF_SWAP_ORIENTATIONS = frozenset(range(5, 9))  # transpose/rotate 90: width <-> height
     _background_session = None
     _background_session_lock = threading.Lock()
 
-    def __init__(self, max_file_size_mb: int = 10):
+    def __init__(self, max_file_size_mb: int = 10,
+                 resize_filter: Image.Resampling = Image.Resampling.LANCZOS):
         self.max_file_size = max_file_size_mb * 1024 * 1024  # Convert MB to bytes
+        self.resize_filter = resize_filter
         self.compression_modes = {
             'lossless': self._compress_lossless,
             'web': self._compress_web,
             'high': self._compress_high
         }
+        # Explicit output-format targets that bypass the per-mode encoders,
+        # keyed by (mode, target format) and sharing the (img, quality, use_webp)
+        # signature so compress_image() resolves its encoder with one lookup.
+        self._format_encoders = {
+            ('lossless', 'png'): lambda img, quality, use_webp: self._save_as_png(img, strip_metadata=False),
+            ('web', 'png'): lambda img, quality, use_webp: self._save_as_png(img, strip_metadata=True),
+            ('high', 'png'): lambda img, quality, use_webp: self._save_as_png(img, strip_metadata=True),
+            ('lossless', 'webp'): lambda img, quality, use_webp: self._save_as_webp_lossless(
+                img, strip_metadata=False),
+            ('lossless', 'jpeg'): lambda img, quality, use_webp: self._save_as_jpeg_quality(
+                img, quality, strip_metadata=False),
+            ('lossless', 'avif'): lambda img, quality, use_webp: self._save_as_avif(
+                img, 100, subsampling='4:4:4', strip_metadata=False),
+            ('web', 'avif'): lambda img, quality, use_webp: self._save_as_avif(
+                img, quality if quality is not None else 60),
+            ('high', 'avif'): lambda img, quality, use_webp: self._save_as_avif(
+                img, quality if quality is not None else 40),
+        }
 
     @staticmethod
     @lru_cache(maxsize=32)
@@ -403,9 +437,26 @@ class ImageCompressor:
         total_luminance = sum(value * count for value, count in enumerate(histogram))
         return total_luminance / total_pixels
 
+    @staticmethod
+    def _exif_orientation(img: Image.Image) -> int:
+        """Read the EXIF orientation tag (1 if absent/unreadable).
+
+        JPEG, WebP and TIFF read EXIF from the header, but a PNG whose eXIf
+        chunk follows the image data is fully loaded by getexif().
+        """
+        try:
+            return img.getexif().get(ExifTags.Base.Orientation, 1)
+        except Exception:
+            return 1
+
     def _apply_exif_orientation(self, img: Image.Image) -> Image.Image:
         """Physically rotate pixels to match EXIF orientation tag."""
         original_format = img.format
+        # exif_transpose() returns a full copy even for upright images, so
+        # check the tag first and hand back the original when nothing to do.
+        if self._exif_orientation(img) not in self._EXIF_TRANSPOSE_ORIENTATIONS:
+            return img
+
         try:
             transposed = ImageOps.exif_transpose(img)
             if transposed is not None:
@@ -415,6 +466,20 @@ class ImageCompressor:
             logger.debug("Could not apply EXIF orientation, using image as-is")
         return img
 
+    def _preprocess(self, img: Image.Image, convert_srgb: bool = False) -> Image.Image:
+        """Orient, normalize color mode, and optionally convert to sRGB.
+
+        Every step returns its input untouched when it has nothing to do, so an
+        upright RGB/RGBA/L/LA image passes through as the same object without
+        a pixel copy, as long as it carries no ICC profile or convert_srgb is
+        False. Any embedded profile, sRGB included, is converted when asked.
+        """
+        img = self._apply_exif_orientation(img)
+        img = self._normalize_color_mode(img)
+        if convert_srgb:
+            img = self._convert_to_srgb(img)
+        return img
+
     def _normalize_color_mode(self, img: Image.Image) -> Image.Image:
         """Convert non-standard color modes to RGB/RGBA."""
         original_format = img.format
@@ -517,35 +582,73 @@ class ImageCompressor:
 
         return removed, warnings
 
-    def validate_image(self, image_data: bytes) -> ValidationResult:
+    @staticmethod
+    def _source_size(image_data: ImageSource) -> int:
+        """Size in bytes of raw image data or a seekable stream."""
+        if isinstance(image_data, (bytes, bytearray)):
+            return len(image_data)
+        pos = image_data.tell()
+        size = image_data.seek(0, io.SEEK_END)
+        image_data.seek(pos)
+        return size
+
+    @staticmethod
+    def _source_bytes(image_data: ImageSource) -> bytes:
+        """Full contents of raw image data or a seekable stream."""
+        if isinstance(image_data, (bytes, bytearray)):
+            return bytes(image_data)
+        image_data.seek(0)
+        return image_data.read()
+
+    @staticmethod
+    def _open_image(image_data: ImageSource) -> Image.Image:
+        """Lazily open image bytes or a stream and remap non-native formats.
+
+        Only the header is parsed here; pixels are decoded once, on first use,
+        so callers should pass the returned image along instead of reopening.
+        Streams are read in place, so they must stay open until then.
+        """
+        if isinstance(image_data, (bytes, bytearray)):
+            img = Image.open(io.BytesIO(image_data))
+        else:
+            image_data.seek(0)
+            img = Image.open(image_data)
+
+        # MPO (Multi-Picture Object) is JPEG with extra frames (common in smartphone photos)
+        if img.format == 'MPO':
+            img.format = 'JPEG'
+
+        # HEIF/HEIC: remap to PNG for lossless pixel preservation
+        # (pillow-heif decodes to standard RGB/RGBA; we never output HEIF)
+        if img.format == 'HEIF':
+            img._source_format = 'HEIF'
+            img.format = 'PNG'
+
+        return img
+
+    def validate_image(self, image_data: ImageSource) -> ValidationResult:
         """
         Validate image data before processing.
         Returns ValidationResult with opened image to avoid reopening.
+
+        Only the header is read here; pixel data is decoded once, inside
+        compress_image(), after draft() has had a chance to pick a reduced
+        JPEG scale. Callers must pass result.image on as preloaded_image.
         """
         errors = []
         warnings = []
         img = None
 
         # Check file size
-        if len(image_data) > self.max_file_size:
+        if self._source_size(image_data) > self.max_file_size:
             errors.append(f"File size exceeds maximum limit of {self.max_file_size // (1024 * 1024)}MB")
 
         try:
             # Try to open the image to validate format
-            img = Image.open(io.BytesIO(image_data))
-
-            # MPO (Multi-Picture Object) is JPEG with extra frames (common in smartphone photos)
-            if img.format == 'MPO':
-                img.format = 'JPEG'
-
-            # HEIF/HEIC: remap to PNG for lossless pixel preservation
-            # (pillow-heif decodes to standard RGB/RGBA; we never output HEIF)
-            if img.format == 'HEIF':
-                img._source_format = 'HEIF'
-                img.format = 'PNG'
+            img = self._open_image(image_data)
 
             # Check format
-            if img.format not in ['JPEG', 'PNG', 'WEBP', 'TIFF']:
+            if img.format not in ['JPEG', 'PNG', 'WEBP', 'TIFF', 'AVIF']:
                 errors.append(f"Unsupported image format: {img.format}")
 
             # Reject decompression bombs
@@ -575,25 +678,26 @@ class ImageCompressor:
         """Convert RGBA/LA image to RGB with white background"""
         if img.mode in ('RGBA', 'LA'):
             background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'RGBA':
-                background.paste(img, mask=img.split()[3])
-            else:
-                background.paste(img, mask=img.split()[1])
+            # Pillow reads the alpha band straight from an RGBA/LA mask, so
+            # there is no need to split() out a copy of every band first.
+            background.paste(img, mask=img)
             return background
         return img
 
     def _has_transparency(self, img: Image.Image) -> bool:
         """Check if image has actual transparent pixels (not just an alpha channel)."""
-        if img.mode == 'RGBA':
-            alpha = img.split()[3]
-            extrema = alpha.getextrema()
-            return extrema[0] < 255  # Has at least one non-fully-opaque pixel
-        if img.mode == 'LA':
-            alpha = img.split()[1]
-            extrema = alpha.getextrema()
-            return extrema[0] < 255
+        if img.mode in ('RGBA', 'LA'):
+            # getchannel() copies only the alpha band; split() would copy all of them
+            return img.getchannel('A').getextrema()[0] < 255
         return False
 
+    @staticmethod
+    def _to_rgb_or_rgba(img: Image.Image) -> Image.Image:
+        """Coerce to the RGB/RGBA modes the WebP and AVIF encoders take, keeping alpha."""
+        if img.mode in ('RGB', 'RGBA'):
+            return img
+        return img.convert('RGBA' if img.mode == 'LA' else 'RGB')
+
     def _save_as_png(self, img: Image.Image, strip_metadata: bool = True) -> bytes:
         """Save image as optimized PNG."""
         output = io.BytesIO()
@@ -608,12 +712,7 @@ class ImageCompressor:
     def _save_as_webp_lossless(self, img: Image.Image, strip_metadata: bool = True) -> bytes:
         """Save image as lossless WebP (for format conversion without quality loss)."""
         output = io.BytesIO()
-        if img.mode in ('RGBA', 'LA'):
-            processed = img if img.mode == 'RGBA' else img.convert('RGBA')
-        elif img.mode == 'RGB':
-            processed = img
-        else:
-            processed = img.convert('RGB')
+        processed = self._to_rgb_or_rgba(img)
         save_params = {'format': 'WEBP', 'lossless': True, 'quality': 80}
         if not strip_metadata:
             icc_profile = img.info.get('icc_profile')
@@ -647,6 +746,22 @@ class ImageCompressor:
         processed.save(output, **save_params)
         return output.getvalue()
 
+    def _save_as_avif(self, img: Image.Image, quality: int, subsampling: str = '4:2:0',
+                      strip_metadata: bool = True) -> bytes:
+        """Save image as AVIF."""
+        output = io.BytesIO()
+        processed = self._to_rgb_or_rgba(img)
+        save_params = {'format': 'AVIF', 'quality': quality, 'subsampling': subsampling, 'speed': 6}
+        if strip_metadata:
+            save_params['exif'] = b''
+            save_params['icc_profile'] = b''
+        else:
+            icc_profile = img.info.get('icc_profile')
+            if icc_profile:
+                save_params['icc_profile'] = icc_profile
+        processed.save(output, **save_params)
+        return output.getvalue()
+
     def _compress_lossless(self, img: Image.Image, quality: Optional[int] = None, use_webp: bool = False) -> bytes:
         """
         Lossless compression - maintains original quality while reducing file size.
@@ -674,6 +789,9 @@ class ImageCompressor:
         elif save_format == 'WEBP':
             save_params['lossless'] = True
             save_params['quality'] = 80  # compression effort for lossless
+        elif save_format == 'AVIF':
+            save_params['quality'] = 100
+            save_params['subsampling'] = '4:4:4'
         elif save_format == 'TIFF':
             save_params['compression'] = 'tiff_adobe_deflate'
             icc_profile = img.info.get('icc_profile')
@@ -690,13 +808,7 @@ class ImageCompressor:
         output = io.BytesIO()
 
         if use_webp:
-            # WebP supports RGBA, keep transparency
-            if img.mode in ('RGBA', 'LA'):
-                processed_img = img if img.mode == 'RGBA' else img.convert('RGBA')
-            elif img.mode == 'RGB':
-                processed_img = img
-            else:
-                processed_img = img.convert('RGB')
+            processed_img = self._to_rgb_or_rgba(img)
         else:
             # JPEG doesn't support transparency — composite onto white
             processed_img = self._remove_transparency(img)
@@ -735,13 +847,7 @@ class ImageCompressor:
         output = io.BytesIO()
 
         if use_webp:
-            # WebP supports RGBA, keep transparency
-            if img.mode in ('RGBA', 'LA'):
-                processed_img = img if img.mode == 'RGBA' else img.convert('RGBA')
-            elif img.mode == 'RGB':
-                processed_img = img
-            else:
-                processed_img = img.convert('RGB')
+            processed_img = self._to_rgb_or_rgba(img)
         else:
             # JPEG doesn't support transparency — composite onto white
             processed_img = self._remove_transparency(img)
@@ -774,9 +880,46 @@ class ImageCompressor:
 
         return output.getvalue()
 
+    def process(
+        self,
+        image_data: ImageSource,
+        mode: str,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        quality: Optional[int] = None,
+        output_format: str = 'auto',
+        watermark_layers: Optional[Dict[str, Dict]] = None,
+        remove_background: bool = False,
+    ) -> ProcessResult:
+        """
+        Validate and compress an upload in one call.
+
+        The image is opened once, by validate_image(), and handed straight to
+        compress_image(); validation errors short-circuit before any decode.
+        """
+        validation = self.validate_image(image_data)
+        if not validation.is_valid:
+            return ProcessResult(is_valid=False, errors=validation.errors,
+                                 warnings=validation.warnings)
+
+        compressed_data, metadata = self.compress_image(
+            image_data,
+            mode,
+            max_width,
+            max_height,
+            quality,
+            output_format=output_format,
+            preloaded_image=validation.image,
+            watermark_layers=watermark_layers,
+            remove_background=remove_background,
+        )
+        warnings = validation.warnings + metadata.pop('format_warnings', [])
+        return ProcessResult(is_valid=True, errors=[], warnings=warnings,
+                             data=compressed_data, metadata=metadata)
+
     def compress_image(
         self,
-        image_data: bytes,
+        image_data: ImageSource,
         mode: str,
         max_width: Optional[int] = None,
         max_height: Optional[int] = None,
@@ -789,36 +932,32 @@ class ImageCompressor:
         """
         Compress an image using the specified mode and parameters.
 
+        image_data may be raw bytes or a seekable binary stream (e.g. an
+        upload's file.stream); it is only opened when preloaded_image is None.
+
         output_format: 'auto', 'webp', 'jpeg', or 'png'. In auto mode, transparent
         images are output as WebP to preserve transparency; opaque images
         become JPEG.  Ignored in lossless mode.
         """
         # Use preloaded image if available, otherwise open it
-        if preloaded_image is not None:
-            img = preloaded_image
-            # Capture true source format before transforms may discard it
-            source_format = getattr(img, '_source_format', None)
-        else:
-            img = Image.open(io.BytesIO(image_data))
-            # Remap non-native input formats (mirrors validate_image logic)
-            source_format = img.format if img.format == 'HEIF' else None
-            if img.format == 'HEIF':
-                img.format = 'PNG'
-
-        # Apply EXIF orientation correction before anything else
-        img = self._apply_exif_orientation(img)
-
-        # Normalize non-standard color modes (CMYK, P, PA, I, 1)
-        img = self._normalize_color_mode(img)
+        img = preloaded_image if preloaded_image is not None else self._open_image(image_data)
+        source_img = img
+        # Capture true source format before transforms may discard it
+        source_format = getattr(img, '_source_format', None)
+
+        # Plan the resize from the header alone (in upright orientation) so a
+        # JPEG can still be decoded at reduced scale before any pixels load.
+        orientation = self._exif_orientation(img)
+        original_dimensions = img.size[::-1] if orientation in self._EXIF_SWAP_ORIENTATIONS else img.size
+        resize_plan = self._plan_resize(original_dimensions, max_width, max_height)
+        self._draft_for_resize(img, resize_plan, orientation)
 
-        # Convert to sRGB when lossy processing or ML background removal is used.
-        if mode in ('web', 'high') or remove_background:
-            img = self._convert_to_srgb(img)
+        # EXIF orientation -> color mode normalization (CMYK, P, PA, I, 1) ->
+        # sRGB conversion when lossy processing or ML background removal is used.
+        img = self._preprocess(img, convert_srgb=mode in ('web', 'high') or remove_background)
 
         original_format = img.format
-        original_size = len(image_data)
-        original_dimensions = img.size
-        resize_plan = self._plan_resize(original_dimensions, max_width, max_height)
+        original_size = self._source_size(image_data)
 
         # Resize if requested before any downstream transforms.
         img = self._apply_resize_plan(img, resize_plan)
@@ -828,7 +967,7 @@ class ImageCompressor:
         if remove_background:
             img, background_warnings = self._apply_background_removal(img)
             format_warnings.extend(background_warnings)
-            background_removed = self._has_transparency(img)
+            background_removed = has_transparency = self._has_transparency(img)
             target_png = True
             use_webp = False
         else:
@@ -842,6 +981,8 @@ class ImageCompressor:
                 use_webp = False
             elif output_format == 'webp':
                 use_webp = True
+            elif output_format == 'avif':
+                use_webp = False  # AVIF keeps transparency itself
             elif output_format == 'jpeg':
                 use_webp = False
                 if has_transparency:
@@ -864,17 +1005,27 @@ class ImageCompressor:
                 watermark_layers,
             )
 
+        # Lossy WebP and AVIF would encode an all-opaque alpha plane as a
+        # separate bitstream. Drop it once here using the scan above, so the
+        # encoders (and the high-mode retry) never rescan the image.
+        if (not target_png and not has_transparency and img.mode in ('RGBA', 'LA')
+                and (output_format == 'avif' or (use_webp and mode != 'lossless'))):
+            img = img.convert('RGB')
+
         # Apply compression based on mode
         # For explicit format targets, bypass mode dispatch with format-specific methods
-        strip_metadata = mode != 'lossless'
-        if target_png:
-            compressed_data = self._save_as_png(img, strip_metadata=strip_metadata)
-        elif mode == 'lossless' and output_format == 'webp':
-            compressed_data = self._save_as_webp_lossless(img, strip_metadata=False)
-        elif mode == 'lossless' and output_format == 'jpeg':
-            compressed_data = self._save_as_jpeg_quality(img, quality, strip_metadata=False)
-        else:
-            compressed_data = self.compression_modes[mode](img, quality, use_webp)
+        encoder = (self._format_encoders.get((mode, 'png' if target_png else output_format))
+                   or self.compression_modes[mode])
+        compressed_data = encoder(img, quality, use_webp)
+
+        # An untouched lossless re-encode of an already-optimized file (or a
+        # JPEG re-saved at q95) can come out larger than the upload; return
+        # the original bytes rather than a bigger copy of the same pixels.
+        if (mode == 'lossless' and output_format == 'auto' and img is source_img
+                and source_format is None and getattr(img, 'n_frames', 1) == 1
+                and len(compressed_data) >= original_size):
+            compressed_data = self._source_bytes(image_data)
+            format_warnings.append("Image is already optimized — original file kept unchanged")
 
         # Calculate compression ratio and prepare metadata
         compression_ratio = round(len(compressed_data) / original_size * 100, 2)
@@ -883,7 +1034,7 @@ class ImageCompressor:
         # try more aggressive settings (don't increase quality above what was asked)
         if mode == 'high' and not target_png and compression_ratio > 50:
             retry_quality = min(quality, 30) if quality is not None else 30
-            retry_data = self._compress_high(img, quality=retry_quality, use_webp=use_webp)
+            retry_data = encoder(img, retry_quality, use_webp)
             retry_ratio = round(len(retry_data) / original_size * 100, 2)
             if retry_ratio < compression_ratio:
                 compressed_data = retry_data
@@ -898,6 +1049,8 @@ class ImageCompressor:
         # Determine actual output format based on mode and settings
         if target_png:
             resolved_format = 'PNG'
+        elif output_format == 'avif':
+            resolved_format = 'AVIF'
         elif mode == 'lossless' and output_format in ('webp', 'jpeg'):
             resolved_format = output_format.upper()
         elif mode == 'lossless':
@@ -940,7 +1093,7 @@ class ImageCompressor:
         Coordinates are in actual image pixels.
         Returns (cropped_bytes, metadata).
         """
-        img = preloaded_image if preloaded_image is not None else Image.open(io.BytesIO(image_data))
+        img = preloaded_image if preloaded_image is not None else self._open_image(image_data)
         original_format = img.format or 'PNG'
         original_size = len(image_data)
         original_dimensions = img.size
@@ -970,6 +1123,11 @@ class ImageCompressor:
                 cropped = cropped.convert('RGB')
             cropped.save(output, format='WEBP', quality=95, method=4)
             resolved_format = 'WEBP'
+        elif fmt == 'AVIF':
+            if cropped.mode not in ('RGB', 'RGBA'):
+                cropped = cropped.convert('RGB')
+            cropped.save(output, format='AVIF', quality=95)
+            resolved_format = 'AVIF'
         elif fmt == 'TIFF':
             cropped.save(output, format='TIFF', compression='tiff_adobe_deflate')
             resolved_format = 'TIFF'
@@ -1087,6 +1245,21 @@ class ImageCompressor:
             upscaled=upscaled,
         )
 
+    def _draft_for_resize(self, img: Image.Image, plan: ResizePlan, orientation: int = 1) -> None:
+        """Ask libjpeg to decode a big downscale at 1/2, 1/4 or 1/8 DCT scale.
+
+        Keeps at least 2x the target size (matching the resize reducing_gap) so
+        the final filter pass still has detail to work with. Only unloaded
+        JPEGs react; draft() is a no-op for other formats and loaded images.
+        """
+        if not plan.changed or plan.upscaled:
+            return
+
+        width, height = plan.target_width, plan.target_height
+        if orientation in self._EXIF_SWAP_ORIENTATIONS:
+            width, height = height, width
+        img.draft(None, (width * 2, height * 2))
+
     def _apply_resize_plan(self, img: Image.Image, plan: ResizePlan) -> Image.Image:
         """Apply a previously computed resize plan."""
         if not plan.active or not plan.changed:
@@ -1094,9 +1267,11 @@ class ImageCompressor:
 
         resize_kwargs = {
             'size': (plan.target_width, plan.target_height),
-            'resample': Image.Resampling.LANCZOS,
+            'resample': self.resize_filter,
         }
         if plan.target_width < img.width or plan.target_height < img.height:
-            resize_kwargs['reducing_gap'] = 3.0
+            # Box-reduce to ~2x the target in C before the filter pass; its cost
+            # scales with source pixels, so big downscales get much cheaper.
+            resize_kwargs['reducing_gap'] = 2.0
 
         return img.resize(**resize_kwargs)
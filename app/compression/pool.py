@@ -0,0 +1,111 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from PIL import Image
+
+from .image_processor import CompressionError, ImageCompressor, ImageSource, ProcessResult
+
+# Per-process compressor, built once by the pool initializer
+_worker_compressor: Optional[ImageCompressor] = None
+
+
+class CompressionPoolError(CompressionError):
+    """Raised when a worker crashes or a job outlives the pool timeout"""
+    pass
+
+
+def _init_worker(max_file_size_mb: int, resize_filter: Image.Resampling) -> None:
+    global _worker_compressor
+    _worker_compressor = ImageCompressor(max_file_size_mb=max_file_size_mb,
+                                         resize_filter=resize_filter)
+
+
+def _process_in_worker(image_data: bytes, args: tuple, kwargs: dict) -> ProcessResult:
+    return _worker_compressor.process(image_data, *args, **kwargs)
+
+
+class CompressionPool:
+    """Run ImageCompressor.process() in worker processes.
+
+    With max_workers=0 (the default) calls run inline on the request thread,
+    exactly as before. Otherwise the upload bytes are shipped to a spawned
+    worker that decodes and encodes them there, so the Pillow/Python glue
+    around each image stops contending for the web worker's GIL.
+
+    The executor is created on first use rather than at import, because
+    Gunicorn runs with --preload and must not fork with a live pool. If a
+    worker dies (e.g. OOM-killed mid-decode) or a job exceeds timeout, the
+    executor is discarded and the next call spawns a fresh one.
+    """
+
+    def __init__(self, compressor: ImageCompressor, max_workers: int = 0,
+                 timeout: Optional[float] = 90):
+        self.compressor = compressor
+        self.max_workers = max(0, max_workers)
+        self.timeout = timeout  # below Gunicorn's 120s so the client gets a 503
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.compressor.max_file_size // (1024 * 1024),
+                              self.compressor.resize_filter),
+                )
+            return self._executor
+
+    def process(self, image_data: ImageSource, *args, **kwargs) -> ProcessResult:
+        """Same contract as ImageCompressor.process()."""
+        if not self.enabled:
+            return self.compressor.process(image_data, *args, **kwargs)
+
+        # Streams cannot cross the process boundary; the worker validates and
+        # decodes the bytes once on its side.
+        if not isinstance(image_data, bytes):
+            image_data.seek(0)
+            image_data = image_data.read()
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_process_in_worker, image_data, args, kwargs)
+        except BrokenProcessPool:
+            # A worker died after an earlier job; nothing of ours was queued
+            # yet, so respawn and submit once more.
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = executor.submit(_process_in_worker, image_data, args, kwargs)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool as exc:
+            self._discard_executor(executor)
+            raise CompressionPoolError("Compression worker crashed") from exc
+        except FutureTimeoutError as exc:
+            future.cancel()
+            self._discard_executor(executor)
+            raise CompressionPoolError("Compression timed out") from exc
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken or stuck executor unless another thread already replaced it."""
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        # Don't wait: a stuck worker finishes (or dies) on its own
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -1,10 +1,20 @@
 import base64
-import io
-
-from flask import Blueprint, render_template, request, jsonify, send_file, current_app, redirect, url_for, session, Response, stream_with_context
+import binascii
+import json
+import os
+import unicodedata
+from urllib.parse import quote
+
+try:
+    from pybase64 import b64encode_as_string
+except ImportError:  # optional SIMD accelerator; stdlib fallback below
+    b64encode_as_string = None
+
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, session, Response, stream_with_context
 from PIL import Image
 
 from .compression import ImageCompressor, ImageValidationError, BackgroundRemovalError
+from .compression.pool import CompressionPool, CompressionPoolError
 from .ai_upscale import (
     AIUpscalerError,
     create_ai_job,
@@ -23,7 +33,7 @@ from .auth import RateLimitExceeded, login_required
 from .validators import (
     validate_file, validate_compression_mode, validate_resize_mode,
     validate_resize_dimensions, validate_quality, validate_output_format,
-    validate_theme, validate_download_data, validate_crop_coordinates,
+    validate_theme, validate_download_data, validate_download_filename, validate_crop_coordinates,
     validate_rotation, sanitize_filename,
     validate_watermark_text, validate_watermark_color, validate_watermark_layer_options,
     validate_watermark_logo, validate_watermark_qr_url, validate_watermark_qr_image,
@@ -35,15 +45,15 @@ from .forms import LoginForm
 
 main = Blueprint('main', __name__)
 
-# Initialize with 50MB limit
-compressor = ImageCompressor(max_file_size_mb=50)
-
-# MIME type mapping
-MIME_TYPES = {
-    'JPEG': 'image/jpeg',
-    'PNG': 'image/png',
-    'WEBP': 'image/webp',
-    'TIFF': 'image/tiff'
+# MIME type mapping, keyed by lowercase file extension (including aliases)
+EXT_TO_MIME = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'tif': 'image/tiff',
+    'tiff': 'image/tiff',
+    'avif': 'image/avif',
 }
 
 # Extension mapping for output formats
@@ -51,11 +61,62 @@ FORMAT_EXTENSIONS = {
     'JPEG': '.jpg',
     'PNG': '.png',
     'WEBP': '.webp',
-    'TIFF': '.tiff'
+    'TIFF': '.tiff',
+    'AVIF': '.avif',
 }
 
 SAFE_AI_IDENTIFIER_ERROR = {'error': 'Invalid AI upscaling identifier.'}
 
+# Documented RESIZE_FILTER values; anything else falls back to lanczos
+RESIZE_FILTERS = {
+    'lanczos': Image.Resampling.LANCZOS,
+    'bicubic': Image.Resampling.BICUBIC,
+    'hamming': Image.Resampling.HAMMING,
+    'bilinear': Image.Resampling.BILINEAR,
+}
+
+
+def _get_resize_filter():
+    """Resampling filter for resizes, from RESIZE_FILTER (default: lanczos).
+
+    BILINEAR/HAMMING are several times cheaper than LANCZOS on large
+    downscales, at some cost in sharpness.
+    """
+    name = os.getenv('RESIZE_FILTER', 'lanczos').strip().lower()
+    return RESIZE_FILTERS.get(name, Image.Resampling.LANCZOS)
+
+
+def _get_compress_workers():
+    """Worker processes for /process compression, from COMPRESS_WORKERS (default: 0, inline)."""
+    try:
+        return max(0, int(os.getenv('COMPRESS_WORKERS', '0')))
+    except ValueError:
+        return 0
+
+
+def configure_compression_app(app) -> None:
+    """Give each app its own compressor (50MB limit) and compression pool."""
+    compressor = ImageCompressor(max_file_size_mb=50, resize_filter=_get_resize_filter())
+    app.extensions['compressor'] = compressor
+    app.extensions['compress_pool'] = CompressionPool(compressor, max_workers=_get_compress_workers())
+
+
+def _set_attachment_filename(response, filename):
+    """Set an attachment Content-Disposition the way send_file() does.
+
+    Header values must be latin-1, so a non-ASCII name is sent as an ASCII
+    fallback plus an RFC 5987 filename* parameter.
+    """
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    else:
+        names = {'filename': filename}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+
 
 def _proxy_ai_stream_response(stream, *, as_attachment: bool, default_name: str):
     filename = stream.filename or default_name
@@ -73,6 +134,39 @@ def _proxy_ai_stream_response(stream, *, as_attachment: bool, default_name: str)
     return response
 
 
+def _get_json_payload():
+    """Parse a JSON request body, or return None if it is missing or malformed.
+
+    cache=False keeps Werkzeug from holding on to the raw body alongside the
+    parsed dict, which matters when it carries a multi-megabyte image.
+    """
+    return request.get_json(silent=True, cache=False)
+
+
+def _encode_base64_payload(data: bytes) -> str:
+    """Base64-encode an image payload for a JSON response.
+
+    pybase64, when installed, encodes with SIMD and builds the str directly
+    instead of going through an intermediate bytes object.
+    """
+    if b64encode_as_string is not None:
+        return b64encode_as_string(data)
+    return base64.b64encode(data).decode('ascii')
+
+
+def _decode_base64_payload(data):
+    """Decode a base64 payload echoed back by the client, or return None.
+
+    Strict mode validates the alphabet and padding in the same C pass that
+    decodes, and an ASCII str is accepted as-is without b64decode()'s
+    str -> bytes copy.
+    """
+    try:
+        return binascii.a2b_base64(data, strict_mode=True)
+    except (TypeError, ValueError):
+        return None
+
+
 def _validate_ai_identifier(identifier: str):
     if not is_safe_ai_identifier((identifier or '').strip()):
         return jsonify(SAFE_AI_IDENTIFIER_ERROR), 400
@@ -109,11 +203,118 @@ def _get_watermark_layer_options(prefix: str):
     }
 
 
+# /process checks run in this order once fields are parsed and overridden;
+# each validator takes the named params positionally
+_PROCESS_PARAM_VALIDATORS = (
+    (validate_compression_mode, ('compression_mode',)),
+    (validate_resize_dimensions, ('resize_mode', 'max_width', 'max_height')),
+    (validate_quality, ('quality',)),
+    (validate_output_format, ('output_format',)),
+)
+
+
+def _parse_process_params():
+    """Read and validate the /process form fields.
+
+    Returns (params, error_message). params is keyed like the matching
+    _process_image_file() arguments.
+    """
+    form = request.form
+    resize_mode = form.get('resize_mode', 'original')
+
+    # Validate resize mode before parsing resize dimensions.
+    is_valid, error_msg = validate_resize_mode(resize_mode)
+    if not is_valid:
+        return None, error_msg
+
+    params = {'resize_mode': resize_mode}
+    for name, label in (('max_width', 'width'), ('max_height', 'height')):
+        is_valid, params[name], error_msg = parse_optional_int_form_value(form.get(name), label)
+        if not is_valid:
+            return None, error_msg
+
+    is_valid, remove_background, error_msg = parse_boolean_form_value(
+        form.get('remove_background'), 'remove_background')
+    if not is_valid:
+        return None, error_msg
+    params['remove_background'] = remove_background
+
+    if remove_background:
+        params.update(compression_mode='lossless', output_format='png', quality=None)
+    else:
+        params.update(
+            compression_mode=form.get('compression_mode', 'lossless'),
+            quality=form.get('quality', type=int),
+            output_format=form.get('output_format', 'auto'),
+        )
+
+    for validate, names in _PROCESS_PARAM_VALIDATORS:
+        is_valid, error_msg = validate(*(params[name] for name in names))
+        if not is_valid:
+            return None, error_msg
+
+    return params, None
+
+
+def _parse_watermark_layers():
+    """Read and validate the optional watermark layers from the /process form.
+
+    Returns (watermark_layers, error_message). Logo and QR layers carry their
+    uploaded file under 'file' until the caller loads it.
+    """
+    watermark_text = request.form.get('watermark_text', '').strip() or None
+    watermark_logo = request.files.get('watermark_logo')
+    watermark_qr_url = request.form.get('watermark_qr_url', '').strip() or None
+    watermark_qr_image = request.files.get('watermark_qr_image')
+    watermark_layers = {}
+
+    if watermark_text:
+        watermark_text_color = request.form.get('watermark_text_color', 'white')
+        is_valid, error_msg = validate_watermark_text(watermark_text)
+        if not is_valid:
+            return None, error_msg
+
+        is_valid, error_msg = validate_watermark_color(watermark_text_color)
+        if not is_valid:
+            return None, error_msg
+
+        watermark_layers['text'] = {'value': watermark_text, 'color': watermark_text_color}
+
+    if watermark_logo:
+        is_valid, error_msg = validate_watermark_logo(watermark_logo)
+        if not is_valid:
+            return None, error_msg
+
+        watermark_layers['logo'] = {'file': watermark_logo}
+
+    if watermark_qr_url or watermark_qr_image:
+        is_valid, error_msg = validate_watermark_qr_url(watermark_qr_url)
+        if not is_valid:
+            return None, error_msg
+
+        is_valid, error_msg = validate_watermark_qr_image(watermark_qr_image)
+        if not is_valid:
+            return None, error_msg
+
+        watermark_layers['qr'] = {'url': watermark_qr_url, 'file': watermark_qr_image}
+
+    # Placement options share one schema across layers
+    for prefix, layer in watermark_layers.items():
+        options = _get_watermark_layer_options(prefix)
+        is_valid, error_msg = validate_watermark_layer_options(**options)
+        if not is_valid:
+            return None, error_msg
+        layer.update(options)
+
+    return watermark_layers, None
+
+
 @main.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
+    submitted = form.validate_on_submit()
 
-    if form.validate_on_submit():
+    if submitted:
         try:
             password = form.password.data
 
@@ -123,17 +324,18 @@ def login():
             return render_template('login.html', form=form, error='Invalid password')
 
         except RateLimitExceeded as e:
-            current_app.logger.warning(f"Rate limit exceeded: {e}")
+            current_app.logger.warning("Rate limit exceeded: %s", e)
             return render_template('login.html', form=form, error=str(e))
         except Exception as e:
-            current_app.logger.error(f"Login error: {e}")
+            current_app.logger.error("Login error: %s", e)
             return render_template('login.html', form=form, error='An error occurred. Please try again.')
 
     # For GET requests or invalid form submission
-    if request.method == 'POST' and not form.validate_on_submit():
-        if form.errors:
+    if request.method == 'POST' and not submitted:
+        form_errors = form.errors
+        if form_errors:
             error_messages = []
-            for field, errors in form.errors.items():
+            for field, errors in form_errors.items():
                 for error in errors:
                     error_messages.append(error)
             return render_template('login.html', form=form, error=', '.join(error_messages))
@@ -153,39 +355,49 @@ def index():
     return render_template('index.html')
 
 
-def _process_image_file(file, compression_mode, resize_mode, max_width, max_height, quality, output_format,
-                        watermark_layers=None, remove_background=False):
-    """Validate, compress, encode, and build response for a single image file.
+def _wants_binary_response():
+    """True when the caller asked for raw image bytes rather than base64 JSON.
 
-    Returns (response_dict, status_code) tuple.
+    The web client always sends Accept: application/json; API callers can
+    send Accept: application/octet-stream to skip the base64 step.
     """
-    image_data = file.read()
+    best = request.accept_mimetypes.best_match(['application/json', 'application/octet-stream'])
+    return best == 'application/octet-stream'
 
-    validation = compressor.validate_image(image_data)
-    if not validation.is_valid:
-        return {
-            'error': 'Image validation failed',
-            'details': validation.errors,
-            'warnings': validation.warnings
-        }, 400
 
-    if validation.warnings:
-        current_app.logger.warning(f"Image warnings for {file.filename}: {validation.warnings}")
+def _process_image_file(file, compression_mode, resize_mode, max_width, max_height, quality, output_format,
+                        watermark_layers=None, remove_background=False, binary=False):
+    """Validate, compress, encode, and build response for a single image file.
+
+    Returns (response, status_code) tuple, where response is a JSON-able dict,
+    or with binary=True a Response carrying the raw image bytes and the
+    metadata in an X-Compression-Metadata header.
+    """
+    # Hand PIL the upload stream directly rather than copying it into bytes;
+    # the image decodes lazily from it within this request.
+    image_data = file.stream
 
-    compressed_data, metadata = compressor.compress_image(
+    result = current_app.extensions['compress_pool'].process(
         image_data,
         compression_mode,
         max_width if resize_mode == 'custom' else None,
         max_height if resize_mode == 'custom' else None,
         quality,
         output_format=output_format,
-        preloaded_image=validation.image,
         watermark_layers=watermark_layers,
         remove_background=remove_background,
     )
+    if not result.is_valid:
+        return {
+            'error': 'Image validation failed',
+            'details': result.errors,
+            'warnings': result.warnings
+        }, 400
 
-    # Encode as base64
-    b64_data = base64.b64encode(compressed_data).decode('ascii')
+    if result.warnings:
+        current_app.logger.warning("Image warnings for %s: %s", file.filename, result.warnings)
+
+    metadata = result.metadata
 
     # Derive extension from actual output format
     resolved_format = metadata.get('format', 'JPEG')
@@ -195,21 +407,29 @@ def _process_image_file(file, compression_mode, resize_mode, max_width, max_heig
     base_name = filename.rsplit('.', 1)[0]
     new_filename = base_name + extension
 
-    # Merge format warnings into the top-level warnings list
-    warnings = list(validation.warnings)
-    format_warnings = metadata.pop('format_warnings', [])
-    warnings.extend(format_warnings)
+    if binary:
+        response = Response(result.data, mimetype=EXT_TO_MIME.get(extension[1:], 'application/octet-stream'))
+        _set_attachment_filename(response, new_filename)
+        # Header values must be latin-1, so keep the stdlib's ASCII escaping
+        response.headers['X-Compression-Metadata'] = json.dumps(
+            {'metadata': metadata, 'warnings': result.warnings}, separators=(',', ':'))
+        return response, 200
 
-    return {
+    metadata['encoding'] = 'base64'
+
+    # Encode as base64
+    b64_data = _encode_base64_payload(result.data)
+
+    response = {
         'message': 'File processed successfully',
-        'metadata': {
-            **metadata,
-            'encoding': 'base64'
-        },
+        'metadata': metadata,
         'compressed_data': b64_data,
         'filename': new_filename,
-        'warnings': warnings
-    }, 200
+    }
+    # Most images produce no warnings; the client treats a missing key as none
+    if result.warnings:
+        response['warnings'] = result.warnings
+    return response, 200
 
 
 @main.route('/process', methods=['POST'])
@@ -222,136 +442,35 @@ def process_image():
         return jsonify({'error': error_msg}), 400
 
     # Get processing parameters
-    compression_mode = request.form.get('compression_mode', 'lossless')
-    resize_mode = request.form.get('resize_mode', 'original')
-    max_width_raw = request.form.get('max_width')
-    max_height_raw = request.form.get('max_height')
-    quality = request.form.get('quality', type=int)
-    output_format = request.form.get('output_format', 'auto')
-    remove_background_raw = request.form.get('remove_background')
-
-    # Validate resize mode before parsing resize dimensions.
-    is_valid, error_msg = validate_resize_mode(resize_mode)
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    is_valid, max_width, error_msg = parse_optional_int_form_value(max_width_raw, 'width')
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    is_valid, max_height, error_msg = parse_optional_int_form_value(max_height_raw, 'height')
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    is_valid, remove_background, error_msg = parse_boolean_form_value(
-        remove_background_raw, 'remove_background')
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    if remove_background:
-        compression_mode = 'lossless'
-        output_format = 'png'
-        quality = None
-
-    # Validate compression mode
-    is_valid, error_msg = validate_compression_mode(compression_mode)
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    # Validate dimensions
-    is_valid, error_msg = validate_resize_dimensions(resize_mode, max_width, max_height)
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    # Validate quality
-    is_valid, error_msg = validate_quality(quality)
-    if not is_valid:
-        return jsonify({'error': error_msg}), 400
-
-    # Validate output format
-    is_valid, error_msg = validate_output_format(output_format)
-    if not is_valid:
+    params, error_msg = _parse_process_params()
+    if error_msg:
         return jsonify({'error': error_msg}), 400
 
     # Get watermark parameters (optional)
-    watermark_text = request.form.get('watermark_text', '').strip() or None
-    watermark_text_color = request.form.get('watermark_text_color', 'white')
-    watermark_logo = request.files.get('watermark_logo')
-    watermark_qr_url = request.form.get('watermark_qr_url', '').strip() or None
-    watermark_qr_image = request.files.get('watermark_qr_image')
-    watermark_layers = {}
-
-    if watermark_text:
-        is_valid, error_msg = validate_watermark_text(watermark_text)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        is_valid, error_msg = validate_watermark_color(watermark_text_color)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        text_options = _get_watermark_layer_options('text')
-        is_valid, error_msg = validate_watermark_layer_options(**text_options)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        watermark_layers['text'] = {
-            'value': watermark_text,
-            'color': watermark_text_color,
-            **text_options,
-        }
-
-    if watermark_logo:
-        is_valid, error_msg = validate_watermark_logo(watermark_logo)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        logo_options = _get_watermark_layer_options('logo')
-        is_valid, error_msg = validate_watermark_layer_options(**logo_options)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        watermark_layers['logo'] = logo_options
-
-    if watermark_qr_url or watermark_qr_image:
-        is_valid, error_msg = validate_watermark_qr_url(watermark_qr_url)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        is_valid, error_msg = validate_watermark_qr_image(watermark_qr_image)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        qr_options = _get_watermark_layer_options('qr')
-        is_valid, error_msg = validate_watermark_layer_options(**qr_options)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
-
-        watermark_layers['qr'] = {
-            'url': watermark_qr_url,
-            **qr_options,
-        }
+    watermark_layers, error_msg = _parse_watermark_layers()
+    if error_msg:
+        return jsonify({'error': error_msg}), 400
 
     try:
-        if 'logo' in watermark_layers:
-            watermark_layers['logo']['image'] = _load_rgba_image(watermark_logo)
+        for layer in watermark_layers.values():
+            if 'file' in layer:
+                layer['image'] = _load_rgba_image(layer.pop('file'))
 
-        if 'qr' in watermark_layers:
-            watermark_layers['qr']['image'] = _load_rgba_image(watermark_qr_image)
-
-        result, status = _process_image_file(
-            file, compression_mode, resize_mode,
-            max_width, max_height, quality, output_format,
+        return _process_image_file(
+            file,
+            **params,
             watermark_layers=watermark_layers or None,
-            remove_background=remove_background,
+            binary=_wants_binary_response(),
         )
-        return jsonify(result), status
 
     except BackgroundRemovalError:
         current_app.logger.exception("Background removal failed during /process")
         return jsonify({
             'error': 'Background removal is unavailable right now. Try again or disable Remove Background.'
         }), 503
+    except CompressionPoolError:
+        current_app.logger.exception("Compression worker failed during /process")
+        return jsonify({'error': 'Image processing is busy right now. Try again shortly.'}), 503
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
@@ -480,7 +599,7 @@ def ai_upscale_download_artifact(artifact_id):
 @main.route('/ai-upscale/download-all', methods=['POST'])
 @login_required
 def ai_upscale_download_all():
-    data = request.json or {}
+    data = _get_json_payload() or {}
     artifacts = data.get('artifacts')
     if not isinstance(artifacts, list) or not artifacts:
         return jsonify({'error': 'No AI upscaled artifacts provided'}), 400
@@ -509,47 +628,54 @@ def ai_upscale_download_all():
 @main.route('/download', methods=['POST'])
 @login_required
 def download_file():
-    """Handle download of compressed images directly from memory"""
-    try:
-        data = request.json
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-
-        compressed_data_str = data.get('compressed_data', '')
-        filename = data.get('filename', '')
-
-        # Validate download data
-        is_valid, error_msg = validate_download_data(compressed_data_str, filename)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
+    """Handle download of compressed images directly from memory.
 
-        try:
-            compressed_data = base64.b64decode(compressed_data_str)
-        except Exception:
-            return jsonify({'error': 'Invalid data encoding'}), 400
+    Accepts either JSON ({compressed_data: <base64>, filename}) or the raw
+    bytes as an application/octet-stream body with ?filename=, which skips
+    JSON parsing and base64 decoding entirely.
+    """
+    try:
+        if request.mimetype == 'application/octet-stream':
+            compressed_data = request.get_data(cache=False)
+            if not compressed_data:
+                return jsonify({'error': 'No data provided'}), 400
+
+            filename = request.args.get('filename', '')
+            is_valid, error_msg = validate_download_filename(filename)
+            if not is_valid:
+                return jsonify({'error': error_msg}), 400
+        else:
+            data = _get_json_payload()
+            if not data:
+                return jsonify({'error': 'No data provided'}), 400
+
+            compressed_data_str = data.get('compressed_data', '')
+            filename = data.get('filename', '')
+
+            # Validate download data
+            is_valid, error_msg = validate_download_data(compressed_data_str, filename)
+            if not is_valid:
+                return jsonify({'error': error_msg}), 400
+
+            compressed_data = _decode_base64_payload(compressed_data_str)
+            if compressed_data is None:
+                return jsonify({'error': 'Invalid data encoding'}), 400
 
         # Sanitize filename
         filename = sanitize_filename(filename)
 
         # Determine the mime type from the file extension
-        file_ext = filename.rsplit('.', 1)[-1].upper()
-        if file_ext == 'JPG':
-            file_ext = 'JPEG'
-        mime_type = MIME_TYPES.get(file_ext, 'application/octet-stream')
-
-        # Create in-memory file
-        file_obj = io.BytesIO(compressed_data)
-        file_obj.seek(0)
-
-        return send_file(
-            file_obj,
-            as_attachment=True,
-            download_name=f"compressed_{filename}",
-            mimetype=mime_type
-        )
+        mime_type = EXT_TO_MIME.get(filename.rpartition('.')[2].lower(), 'application/octet-stream')
+
+        # The payload is already in memory: hand it over as a single body with
+        # a known length instead of letting send_file() re-read a BytesIO in
+        # 8 KiB blocks through a file wrapper.
+        response = Response(compressed_data, mimetype=mime_type)
+        _set_attachment_filename(response, f"compressed_{filename}")
+        return response
 
     except Exception as e:
-        current_app.logger.error(f"Download failed: {e}")
+        current_app.logger.error("Download failed: %s", e)
         return jsonify({'error': 'Download failed'}), 500
 
 
@@ -558,7 +684,7 @@ def download_file():
 def crop_image():
     """Crop and/or rotate an already-processed image."""
     try:
-        data = request.json
+        data = _get_json_payload()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
@@ -592,12 +718,12 @@ def crop_image():
             return jsonify({'error': 'Invalid crop coordinates'}), 400
 
         # Decode base64
-        try:
-            image_bytes = base64.b64decode(compressed_data_str)
-        except Exception:
+        image_bytes = _decode_base64_payload(compressed_data_str)
+        if image_bytes is None:
             return jsonify({'error': 'Invalid data encoding'}), 400
 
         # Validate image (size, format, dimensions) — same guards as /process
+        compressor = current_app.extensions['compressor']
         validation = compressor.validate_image(image_bytes)
         if not validation.is_valid:
             return jsonify({
@@ -632,7 +758,7 @@ def crop_image():
             metadata['original_dimensions'] = pre_rotation_dims
 
         # Encode result as base64
-        b64_data = base64.b64encode(cropped_data).decode('ascii')
+        b64_data = _encode_base64_payload(cropped_data)
 
         # Sanitize filename
         filename = sanitize_filename(filename)
@@ -650,14 +776,14 @@ def crop_image():
     except ImageValidationError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        current_app.logger.error(f"Crop failed: {e}")
+        current_app.logger.error("Crop failed: %s", e)
         return jsonify({'error': 'Crop failed'}), 500
 
 
 @main.route('/theme', methods=['POST'])
 @login_required
 def toggle_theme():
-    data = request.json
+    data = _get_json_payload()
     if not data:
         return jsonify({'error': 'No data provided'}), 400
 
@@ -3,7 +3,6 @@
  */
 import { $, createElement, downloadBlob, base64ToUint8Array } from '../lib/dom.js';
 import { bus } from '../lib/events.js';
-import { postJSON } from '../lib/api.js';
 import { state, clearAllFiles, updateFile } from '../state/app-state.js';
 import { cleanupRemoteResult, clearTileProgress, processTile } from './image-tile.js';
 import { showToast } from '../components/toast.js';
@@ -17,7 +16,7 @@ import {
   isAIUpscaleMode,
 } from './settings.js';
 import { downloadAIArtifact, downloadAIArtifacts } from '../lib/ai-upscale-api.js';
-import { ensureDownloadPayload } from '../lib/download-payload.js';
+import { ensureDownloadPayload, inlinePayloadBlob } from '../lib/download-payload.js';
 
 const OPTIMIZE_BATCH_CHUNK_SIZE = 5;
 const AI_UPSCALE_BATCH_CHUNK_SIZE = 1;
@@ -631,11 +630,7 @@ async function downloadAll() {
         return;
       }
 
-      const response = await postJSON('/download', {
-        compressed_data: payload.data,
-        filename: entry.processedData.filename,
-      });
-      const blob = await response.blob();
+      const blob = inlinePayloadBlob(payload, entry.processedData.metadata?.format);
       downloadBlob(blob, `processed_${entry.processedData.filename}`);
     } catch (error) {
       showToast({ message: `Download failed: ${error.message}`, type: 'error' });
@@ -3,7 +3,7 @@
  */
 import { $, createElement, icon, downloadBlob, base64ToUint8Array, formatToMime } from '../lib/dom.js';
 import { bus } from '../lib/events.js';
-import { postForm, postJSON } from '../lib/api.js';
+import { postForm } from '../lib/api.js';
 import { state, updateFile, removeFile, setWatermarkPreviewFileId } from '../state/app-state.js';
 import {
   appendSettingsToFormData,
@@ -22,7 +22,7 @@ import {
   getAIUpscaleHealth,
   getAIUpscaleJob,
 } from '../lib/ai-upscale-api.js';
-import { ensureDownloadPayload } from '../lib/download-payload.js';
+import { ensureDownloadPayload, inlinePayloadBlob } from '../lib/download-payload.js';
 
 const AI_UPSCALE_POLL_INTERVALS_MS = {
   queued: 2000,
@@ -632,12 +632,7 @@ async function downloadFile(fileId, tile) {
       return;
     }
 
-    const response = await postJSON('/download', {
-      compressed_data: payload.data,
-      filename: entry.processedData.filename,
-    });
-
-    const blob = await response.blob();
+    const blob = inlinePayloadBlob(payload, entry.processedData.metadata?.format);
     downloadBlob(blob, `processed_${entry.processedData.filename}`);
   } catch (error) {
     console.error('Download error:', error);
@@ -58,11 +58,12 @@ const FORMAT_LABELS = {
   png: 'PNG',
   webp: 'WebP',
   jpeg: 'JPEG',
+  avif: 'AVIF',
 };
 
 const QUALITY_DEFAULTS = {
-  web:  { auto: 80, webp: 75, jpeg: 85 },
-  high: { auto: 50, webp: 40, jpeg: 60 },
+  web:  { auto: 80, webp: 75, jpeg: 85, avif: 60 },
+  high: { auto: 50, webp: 40, jpeg: 60, avif: 40 },
 };
 
 const AI_MODEL_LABELS = {
@@ -7,8 +7,8 @@ import { state, addFile } from '../state/app-state.js';
 import { showToast } from '../components/toast.js';
 import { createImageTile } from './image-tile.js';
 
-const ACCEPTED_TYPES = new Set(['image/jpeg', 'image/png', 'image/webp', 'image/tiff', 'image/heic', 'image/heif']);
-const ACCEPTED_EXTENSIONS = new Set(['.jpg', '.jpeg', '.png', '.webp', '.tiff', '.tif', '.heic', '.heif']);
+const ACCEPTED_TYPES = new Set(['image/jpeg', 'image/png', 'image/webp', 'image/tiff', 'image/heic', 'image/heif', 'image/avif']);
+const ACCEPTED_EXTENSIONS = new Set(['.jpg', '.jpeg', '.png', '.webp', '.tiff', '.tif', '.heic', '.heif', '.avif']);
 const MAX_FILE_SIZE = 50 * 1024 * 1024; // 50 MB
 
 export function initApp() {
@@ -83,7 +83,7 @@ export function base64ToUint8Array(base64String) {
  */
 export function formatToMime(fmt) {
   const f = (fmt || 'jpeg').toLowerCase();
-  return f === 'png' ? 'image/png' : f === 'webp' ? 'image/webp' : f === 'tiff' ? 'image/tiff' : 'image/jpeg';
+  return f === 'png' ? 'image/png' : f === 'webp' ? 'image/webp' : f === 'tiff' ? 'image/tiff' : f === 'avif' ? 'image/avif' : 'image/jpeg';
 }
 
 /**
@@ -1,3 +1,5 @@
+import { base64ToUint8Array, formatToMime } from './dom.js';
+
 export function ensureDownloadPayload(entry) {
   if (entry?.artifactRefs?.download?.artifact_id) {
     return { kind: 'artifact', artifactId: entry.artifactRefs.download.artifact_id };
@@ -9,3 +11,14 @@ export function ensureDownloadPayload(entry) {
 
   throw new Error('This result is missing its downloadable output. Retry the image.');
 }
+
+/**
+ * Build a Blob from an inline payload. The bytes are already in memory, so
+ * there is no need to POST them back to /download just to receive them again.
+ * @param {{ data: string }} payload
+ * @param {string} [format] - Output format reported by /process (e.g. 'JPEG')
+ * @returns {Blob}
+ */
+export function inlinePayloadBlob(payload, format) {
+  return new Blob([base64ToUint8Array(payload.data)], { type: formatToMime(format) });
+}
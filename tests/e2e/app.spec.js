@@ -357,7 +357,7 @@ test('redirects to login on session expiry during API actions', async ({ page, c
   await waitForDoneCount(page, 1);
 
   await context.clearCookies();
-  await page.locator('.tile__download-btn').click();
+  await page.locator('#theme-toggle').click();
 
   await expect(page).toHaveURL(/\/login$/);
 });
@@ -374,7 +374,7 @@ test('reloads the app when an authenticated request hits an expired CSRF token',
     }
   });
 
-  await page.locator('.tile__download-btn').click();
+  await page.locator('#theme-toggle').click();
   await page.waitForLoadState('networkidle');
 
   await expect(page).toHaveURL(/\/$/);
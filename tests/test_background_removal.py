@@ -2,10 +2,15 @@ import base64
 import io
 import json
 
+import pytest
 from PIL import Image, ImageDraw
 
 from app.compression.image_processor import BackgroundRemovalError
-from app.routes import compressor as route_compressor
+
+
+@pytest.fixture()
+def route_compressor(app):
+    return app.extensions['compressor']
 
 
 def make_image(fmt='JPEG', size=(320, 240), color=(180, 180, 180), mode='RGB'):
@@ -36,7 +41,7 @@ def decode_image(b64_data):
 
 class TestBackgroundRemovalRoute:
 
-    def test_process_without_background_removal_keeps_existing_behavior(self, auth_client, monkeypatch):
+    def test_process_without_background_removal_keeps_existing_behavior(self, auth_client, monkeypatch, route_compressor):
         def unexpected_call(_img):
             raise AssertionError("background removal should not run when disabled")
 
@@ -57,7 +62,7 @@ class TestBackgroundRemovalRoute:
         assert body['metadata']['format'] == 'JPEG'
         assert body['filename'].endswith('.jpg')
 
-    def test_background_removal_forces_transparent_png_output(self, auth_client, monkeypatch):
+    def test_background_removal_forces_transparent_png_output(self, auth_client, monkeypatch, route_compressor):
         monkeypatch.setattr(
             route_compressor,
             '_apply_background_removal',
@@ -102,7 +107,7 @@ class TestBackgroundRemovalRoute:
         assert resp.status_code == 400
         assert resp.get_json()['error'] == 'Invalid remove_background value'
 
-    def test_background_removal_warning_bubbles_up(self, auth_client, monkeypatch):
+    def test_background_removal_warning_bubbles_up(self, auth_client, monkeypatch, route_compressor):
         opaque = Image.new('RGBA', (320, 240), (255, 255, 255, 255))
         monkeypatch.setattr(
             route_compressor,
@@ -125,7 +130,7 @@ class TestBackgroundRemovalRoute:
         assert 'Background removal completed, but no transparent pixels were detected' in body['warnings']
         assert body['metadata']['background_removed'] is False
 
-    def test_background_removed_png_can_be_cropped(self, auth_client, monkeypatch):
+    def test_background_removed_png_can_be_cropped(self, auth_client, monkeypatch, route_compressor):
         monkeypatch.setattr(
             route_compressor,
             '_apply_background_removal',
@@ -164,7 +169,7 @@ class TestBackgroundRemovalRoute:
         assert cropped.mode == 'RGBA'
         assert cropped.getchannel('A').getextrema()[0] == 0
 
-    def test_background_removal_failure_returns_503(self, auth_client, monkeypatch):
+    def test_background_removal_failure_returns_503(self, auth_client, monkeypatch, route_compressor):
         def fail(_img):
             raise BackgroundRemovalError("Could not initialize background removal model")
 
@@ -0,0 +1,335 @@
+"""Tests for ImageCompressor encode paths and output format selection."""
+import io
+import json
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from app.compression.image_processor import ImageCompressor
+from app.compression.pool import CompressionPool, CompressionPoolError
+
+
+def make_image_bytes(fmt='PNG', size=(120, 80), color=(40, 90, 160, 255), mode='RGBA'):
+    img = Image.new(mode, size, color)
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class TestWebpEncoding:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def test_opaque_rgba_drops_alpha_plane(self):
+        data = make_image_bytes()
+
+        compressed, metadata = self.compressor.compress_image(data, 'web', output_format='webp')
+
+        assert metadata['format'] == 'WEBP'
+        assert Image.open(io.BytesIO(compressed)).mode == 'RGB'
+
+    def test_transparent_rgba_keeps_alpha(self):
+        data = make_image_bytes(color=(40, 90, 160, 100))
+
+        compressed, metadata = self.compressor.compress_image(data, 'high', output_format='webp')
+
+        assert metadata['format'] == 'WEBP'
+        assert Image.open(io.BytesIO(compressed)).mode == 'RGBA'
+
+    def test_alpha_is_scanned_once_including_high_mode_retry(self, monkeypatch):
+        calls = []
+        original = ImageCompressor._has_transparency
+
+        def counting_scan(compressor, img):
+            calls.append(img.mode)
+            return original(compressor, img)
+
+        monkeypatch.setattr(ImageCompressor, '_has_transparency', counting_scan)
+        buf = io.BytesIO()
+        Image.linear_gradient('L').resize((128, 128)).convert('RGBA').save(buf, format='PNG')
+
+        compressed, metadata = self.compressor.compress_image(
+            buf.getvalue(), 'high', quality=95, output_format='webp')
+
+        assert any('aggressive compression retry' in w for w in metadata['format_warnings'])
+        assert calls == ['RGBA']
+        assert Image.open(io.BytesIO(compressed)).mode == 'RGB'
+
+
+class TestAvifEncoding:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def test_transparent_image_keeps_alpha_without_warning(self):
+        data = make_image_bytes(color=(40, 90, 160, 100))
+
+        compressed, metadata = self.compressor.compress_image(data, 'web', output_format='avif')
+
+        assert metadata['format'] == 'AVIF'
+        assert metadata['format_warnings'] == []
+        assert Image.open(io.BytesIO(compressed)).mode == 'RGBA'
+
+    def test_opaque_rgba_drops_alpha_plane(self):
+        compressed, _ = self.compressor.compress_image(make_image_bytes(), 'web', output_format='avif')
+
+        assert Image.open(io.BytesIO(compressed)).mode == 'RGB'
+
+    def test_high_mode_retry_stays_avif(self):
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160), size=(64, 64))
+
+        compressed, metadata = self.compressor.compress_image(data, 'high', quality=95, output_format='avif')
+
+        assert metadata['format'] == 'AVIF'
+        assert Image.open(io.BytesIO(compressed)).format == 'AVIF'
+
+
+class TestEncoderDispatch:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    @pytest.mark.parametrize('mode,output_format,expected', [
+        ('lossless', 'auto', 'PNG'),
+        ('lossless', 'png', 'PNG'),
+        ('lossless', 'webp', 'WEBP'),
+        ('lossless', 'jpeg', 'JPEG'),
+        ('web', 'auto', 'JPEG'),
+        ('web', 'png', 'PNG'),
+        ('web', 'webp', 'WEBP'),
+        ('high', 'jpeg', 'JPEG'),
+        ('high', 'png', 'PNG'),
+        ('lossless', 'avif', 'AVIF'),
+        ('web', 'avif', 'AVIF'),
+        ('high', 'avif', 'AVIF'),
+    ])
+    def test_output_format_matches_encoded_bytes(self, mode, output_format, expected):
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160))
+
+        compressed, metadata = self.compressor.compress_image(data, mode, output_format=output_format)
+
+        assert metadata['format'] == expected
+        assert Image.open(io.BytesIO(compressed)).format == expected
+
+
+class TestLosslessPassthrough:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def make_low_quality_jpeg(self, size=(200, 150)):
+        img = Image.effect_noise(size, 64).convert('RGB')
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=40)
+        return buf.getvalue()
+
+    def test_untouched_image_keeps_original_bytes_when_reencode_is_larger(self):
+        data = self.make_low_quality_jpeg()
+
+        compressed, metadata = self.compressor.compress_image(io.BytesIO(data), 'lossless')
+
+        assert compressed == data
+        assert metadata['compression_ratio'] == 100.0
+        assert metadata['format'] == 'JPEG'
+        assert any('already optimized' in w for w in metadata['format_warnings'])
+
+    def test_resized_image_is_always_reencoded(self):
+        data = self.make_low_quality_jpeg()
+
+        compressed, metadata = self.compressor.compress_image(data, 'lossless', 100, None)
+
+        assert compressed != data
+        assert metadata['final_dimensions'] == (100, 75)
+
+
+class TestStreamInput:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def test_validate_and_compress_accept_a_stream(self):
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160))
+        stream = io.BytesIO(data)
+        stream.seek(5)
+
+        validation = self.compressor.validate_image(stream)
+        assert validation.is_valid
+        assert validation.image.size == (120, 80)
+
+        _, metadata = self.compressor.compress_image(
+            stream, 'web', preloaded_image=validation.image)
+        assert metadata['original_size'] == len(data)
+
+    def test_oversized_stream_is_rejected(self):
+        compressor = ImageCompressor(max_file_size_mb=0)
+        stream = io.BytesIO(make_image_bytes())
+
+        validation = compressor.validate_image(stream)
+
+        assert not validation.is_valid
+        assert 'File size exceeds' in validation.errors[0]
+
+
+class TestProcess:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def test_merges_validation_and_format_warnings(self):
+        data = make_image_bytes(color=(40, 90, 160, 100))
+
+        result = self.compressor.process(data, 'web', output_format='jpeg')
+
+        assert result.is_valid
+        assert result.errors == []
+        assert 'format_warnings' not in result.metadata
+        assert any('JPEG does not support transparency' in w for w in result.warnings)
+        assert Image.open(io.BytesIO(result.data)).format == 'JPEG'
+
+    def test_invalid_upload_is_rejected_without_output(self):
+        result = self.compressor.process(b'not an image', 'web')
+
+        assert not result.is_valid
+        assert result.data is None
+        assert 'Invalid image file' in result.errors[0]
+
+
+class TestSingleDecode:
+
+    def test_process_opens_upload_once(self, auth_client, monkeypatch):
+        calls = []
+        original = ImageCompressor._open_image
+
+        def counting_open(image_data):
+            calls.append(image_data)
+            return original(image_data)
+
+        monkeypatch.setattr(ImageCompressor, '_open_image', staticmethod(counting_open))
+        payload = {
+            'file': (io.BytesIO(make_image_bytes(fmt='JPEG', mode='RGB', color=(40, 90, 160))), 'photo.jpg'),
+            'compression_mode': 'web',
+        }
+
+        response = auth_client.post('/process', data=payload, content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert len(calls) == 1
+
+
+class TestCompressionPool:
+
+    def test_disabled_pool_runs_inline(self):
+        compressor = ImageCompressor(max_file_size_mb=50)
+        pool = CompressionPool(compressor)
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160))
+
+        result = pool.process(data, 'web')
+
+        assert not pool.enabled
+        assert pool._executor is None
+        assert result.data == compressor.compress_image(data, 'web')[0]
+
+    def test_worker_output_matches_inline(self):
+        compressor = ImageCompressor(max_file_size_mb=50)
+        pool = CompressionPool(compressor, max_workers=1)
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160))
+        try:
+            result = pool.process(io.BytesIO(data), 'web', 60, None, output_format='webp')
+        finally:
+            pool.shutdown()
+
+        expected = compressor.process(data, 'web', 60, None, output_format='webp')
+        assert result == expected
+        assert result.metadata['final_dimensions'] == (60, 40)
+
+    def test_dead_worker_is_replaced_on_next_call(self):
+        compressor = ImageCompressor(max_file_size_mb=50)
+        pool = CompressionPool(compressor, max_workers=1)
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160))
+        try:
+            with pytest.raises(BrokenProcessPool):
+                pool._get_executor().submit(os._exit, 1).result()
+
+            result = pool.process(data, 'web')
+        finally:
+            pool.shutdown()
+
+        assert result.is_valid
+
+    def test_timeout_discards_executor(self):
+        compressor = ImageCompressor(max_file_size_mb=50)
+        pool = CompressionPool(compressor, max_workers=1, timeout=0.001)
+        data = make_image_bytes(mode='RGB', color=(40, 90, 160))
+        try:
+            with pytest.raises(CompressionPoolError):
+                pool.process(data, 'web')
+            assert pool._executor is None
+
+            pool.timeout = None
+            result = pool.process(data, 'web')
+        finally:
+            pool.shutdown()
+
+        assert result.is_valid
+
+    def test_pool_failure_returns_503(self, app, auth_client, monkeypatch):
+        def fail(*args, **kwargs):
+            raise CompressionPoolError("Compression worker crashed")
+
+        monkeypatch.setattr(app.extensions['compress_pool'], 'process', fail)
+        payload = {
+            'file': (io.BytesIO(make_image_bytes(fmt='JPEG', mode='RGB', color=(40, 90, 160))), 'photo.jpg'),
+            'compression_mode': 'web',
+        }
+
+        response = auth_client.post('/process', data=payload, content_type='multipart/form-data')
+
+        assert response.status_code == 503
+
+
+class TestBinaryResponse:
+
+    def post(self, auth_client, accept, filename='photo.png'):
+        payload = {
+            'file': (io.BytesIO(make_image_bytes(color=(40, 90, 160, 100))), filename),
+            'compression_mode': 'web',
+            'output_format': 'jpeg',
+        }
+        return auth_client.post('/process', data=payload, content_type='multipart/form-data',
+                                headers={'Accept': accept})
+
+    def test_octet_stream_accept_returns_raw_bytes(self, auth_client):
+        response = self.post(auth_client, 'application/octet-stream')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.headers['Content-Disposition'] == 'attachment; filename=photo.jpg'
+        assert Image.open(io.BytesIO(response.data)).format == 'JPEG'
+
+        info = json.loads(response.headers['X-Compression-Metadata'])
+        assert info['metadata']['compressed_size'] == len(response.data)
+        assert 'encoding' not in info['metadata']
+        assert any('JPEG does not support transparency' in w for w in info['warnings'])
+
+    def test_non_ascii_upload_name_is_rfc5987_encoded(self, auth_client):
+        response = self.post(auth_client, 'application/octet-stream', filename='写真.png')
+
+        disposition = response.headers['Content-Disposition']
+        assert response.status_code == 200
+        disposition.encode('latin-1')
+        assert disposition == "attachment; filename=.jpg; filename*=UTF-8''%E5%86%99%E7%9C%9F.jpg"
+
+    def test_json_accept_keeps_base64_payload(self, auth_client):
+        response = self.post(auth_client, 'application/json')
+
+        assert response.mimetype == 'application/json'
+        assert response.get_json()['metadata']['encoding'] == 'base64'
@@ -518,6 +518,17 @@ class TestCropRoute:
             content_type='application/json')
         assert resp.status_code == 400
 
+    def test_rejects_non_base64_alphabet(self, auth_client):
+        resp = auth_client.post('/crop',
+            data=json.dumps({
+                'compressed_data': '****' * 8,
+                'filename': 'test.jpg',
+                'crop': {'x': 0, 'y': 0, 'width': 10, 'height': 10},
+            }),
+            content_type='application/json')
+        assert resp.status_code == 400
+        assert resp.get_json()['error'] == 'Invalid data encoding'
+
     # --- Auth ---
 
     def test_requires_auth(self, client):
@@ -534,6 +545,11 @@ class TestCropRoute:
         resp = auth_client.post('/crop', content_type='application/json')
         assert resp.status_code in (400, 500)
 
+    def test_malformed_json_body(self, auth_client):
+        resp = auth_client.post('/crop', data='{"compressed_data": ', content_type='application/json')
+        assert resp.status_code == 400
+        assert resp.get_json()['error'] == 'No data provided'
+
     def test_malicious_filename_rejected(self, auth_client):
         """Filenames with path traversal are rejected by validate_download_data."""
         data = make_image('JPEG', (200, 200))
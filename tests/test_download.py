@@ -0,0 +1,124 @@
+"""Tests for the /download route."""
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from app import routes
+from app.validators import sanitize_filename
+
+
+def make_png(size=(40, 30)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def test_download_returns_payload_as_attachment(auth_client):
+    data = make_png()
+
+    resp = auth_client.post('/download', json={
+        'compressed_data': base64.b64encode(data).decode('ascii'),
+        'filename': 'photo.png',
+    })
+
+    assert resp.status_code == 200
+    assert resp.data == data
+    assert resp.mimetype == 'image/png'
+    assert resp.content_length == len(data)
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=compressed_photo.png'
+
+
+@pytest.mark.parametrize('filename,mimetype', [
+    ('photo.JPG', 'image/jpeg'),
+    ('photo.jpeg', 'image/jpeg'),
+    ('scan.tif', 'image/tiff'),
+    ('photo.webp', 'image/webp'),
+    ('notes', 'application/octet-stream'),
+])
+def test_download_mimetype_follows_extension(auth_client, filename, mimetype):
+    resp = auth_client.post(f'/download?filename={filename}', data=make_png(),
+                            content_type='application/octet-stream')
+
+    assert resp.status_code == 200
+    assert resp.mimetype == mimetype
+
+
+def test_download_rejects_invalid_encoding(auth_client):
+    resp = auth_client.post('/download', json={'compressed_data': 'ab$d', 'filename': 'photo.png'})
+
+    assert resp.status_code == 400
+    assert resp.get_json()['error'] == 'Invalid data encoding'
+
+
+def test_download_accepts_raw_octet_stream_body(auth_client):
+    data = make_png()
+
+    resp = auth_client.post('/download?filename=photo.png', data=data,
+                            content_type='application/octet-stream')
+
+    assert resp.status_code == 200
+    assert resp.data == data
+    assert resp.mimetype == 'image/png'
+    assert resp.headers['Content-Disposition'] == 'attachment; filename=compressed_photo.png'
+
+
+def test_download_non_ascii_filename_is_rfc5987_encoded(auth_client):
+    resp = auth_client.post('/download', json={
+        'compressed_data': base64.b64encode(make_png()).decode('ascii'),
+        'filename': '写真.png',
+    })
+
+    disposition = resp.headers['Content-Disposition']
+    assert resp.status_code == 200
+    disposition.encode('latin-1')
+    assert disposition == "attachment; filename=compressed_.png; filename*=UTF-8''compressed_%E5%86%99%E7%9C%9F.png"
+
+
+def test_download_raw_body_requires_safe_filename(auth_client):
+    resp = auth_client.post('/download?filename=../photo.png', data=make_png(),
+                            content_type='application/octet-stream')
+
+    assert resp.status_code == 400
+    assert resp.get_json()['error'] == 'Invalid filename'
+
+
+@pytest.mark.parametrize('filename,expected', [
+    ('photo.png', 'photo.png'),
+    ('my photo (1).jpg', 'my_photo__1_.jpg'),
+    ('a/./b.png', 'a.b.png'),
+    ('..\\..\\etc.png', 'etc.png'),
+    ('./.png', 'png'),
+    ('café – menu.webp', 'café___menu.webp'),
+])
+def test_sanitize_filename(filename, expected):
+    assert sanitize_filename(filename) == expected
+
+
+@pytest.mark.parametrize('accelerated', [False, True])
+def test_encode_base64_payload_matches_stdlib(monkeypatch, accelerated):
+    encoder = pytest.importorskip('pybase64').b64encode_as_string if accelerated else None
+    monkeypatch.setattr(routes, 'b64encode_as_string', encoder)
+    data = make_png()
+
+    assert routes._encode_base64_payload(data) == base64.b64encode(data).decode('ascii')
+
+
+def test_process_json_payload_uses_pybase64_when_available(auth_client, monkeypatch):
+    calls = []
+
+    def fake_encoder(data):
+        calls.append(data)
+        return base64.b64encode(data).decode('ascii')
+
+    monkeypatch.setattr(routes, 'b64encode_as_string', fake_encoder)
+
+    resp = auth_client.post('/process', data={
+        'file': (io.BytesIO(make_png()), 'photo.png'),
+        'compression_mode': 'web',
+    }, content_type='multipart/form-data')
+
+    assert resp.status_code == 200
+    assert len(calls) == 1
+    assert base64.b64decode(resp.get_json()['compressed_data']) == calls[0]
@@ -63,6 +63,12 @@ class TestValidateFileExtension:
         ok, err = validate_file(fs)
         assert ok is True and err is None
 
+    @pytest.mark.parametrize('filename', ['heic', 'photo.', 'photo.heic.txt'])
+    def test_missing_or_unknown_extension_rejected(self, filename):
+        fs = make_file_storage(make_heif_image(), filename)
+        ok, err = validate_file(fs)
+        assert ok is False and err.startswith('Invalid file type')
+
 
 # ===========================================================================
 # validate_image — format remap
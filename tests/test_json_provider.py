@@ -0,0 +1,45 @@
+from datetime import date, datetime, timezone
+
+from app.json_provider import ORJSONProvider
+
+
+def test_app_uses_orjson_provider(app):
+    assert isinstance(app.json, ORJSONProvider)
+
+
+def test_response_serializes_tuples_and_sorts_keys(app):
+    with app.app_context():
+        response = app.json.response({'b': (1, 2), 'a': None})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == b'{"a":null,"b":[1,2]}\n'
+
+
+def test_dates_keep_flask_http_date_format(app):
+    moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with app.app_context():
+        encoded = app.json.dumps({'at': moment, 'on': date(2024, 1, 1)})
+
+    assert app.json.loads(encoded) == {
+        'at': 'Mon, 01 Jan 2024 00:00:00 GMT',
+        'on': 'Mon, 01 Jan 2024 00:00:00 GMT',
+    }
+
+
+def test_loads_accepts_bytes_and_str(app):
+    assert app.json.loads(b'{"theme": "dark"}') == {'theme': 'dark'}
+    assert app.json.loads('[1, 2]') == [1, 2]
+
+
+def test_theme_rejects_malformed_json_body(auth_client):
+    response = auth_client.post('/theme', data='{"theme":', content_type='application/json')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'No data provided'}
+
+
+def test_theme_round_trips_through_provider(auth_client):
+    response = auth_client.post('/theme', json={'theme': 'dark'})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'theme': 'dark'}
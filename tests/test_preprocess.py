@@ -0,0 +1,121 @@
+"""Tests for ImageCompressor pre-compression steps (EXIF orientation, color mode, JPEG draft)."""
+import io
+
+import pytest
+from PIL import ExifTags, Image
+
+from app.compression.image_processor import ImageCompressor
+
+
+def make_jpeg(size=(120, 80), color=(200, 40, 40), orientation=None):
+    img = Image.new('RGB', size, color)
+    buf = io.BytesIO()
+    save_kwargs = {'format': 'JPEG', 'quality': 95}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        save_kwargs['exif'] = exif.tobytes()
+    img.save(buf, **save_kwargs)
+    return buf.getvalue()
+
+
+class TestPreprocess:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def test_upright_rgb_passes_through_without_copy(self):
+        img = Image.open(io.BytesIO(make_jpeg(orientation=1)))
+
+        assert self.compressor._preprocess(img) is img
+
+    def test_missing_orientation_passes_through_without_copy(self):
+        img = Image.open(io.BytesIO(make_jpeg()))
+
+        assert self.compressor._preprocess(img, convert_srgb=True) is img
+
+    def test_rotated_orientation_is_applied_and_format_kept(self):
+        img = Image.open(io.BytesIO(make_jpeg(orientation=6)))
+
+        result = self.compressor._preprocess(img)
+
+        assert result is not img
+        assert result.size == (80, 120)
+        assert result.format == 'JPEG'
+        assert ExifTags.Base.Orientation not in result.getexif()
+
+    def test_palette_image_is_normalized(self):
+        img = Image.new('RGB', (40, 40), (10, 20, 30)).convert('P')
+        img.format = 'PNG'
+
+        result = self.compressor._preprocess(img)
+
+        assert result.mode == 'RGB'
+        assert result.format == 'PNG'
+
+    def test_compress_rotated_jpeg_reports_oriented_dimensions(self):
+        data = make_jpeg(size=(120, 80), orientation=8)
+
+        _, metadata = self.compressor.compress_image(data, 'web')
+
+        assert metadata['original_dimensions'] == (80, 120)
+        assert metadata['final_dimensions'] == (80, 120)
+
+
+class TestDraftDecode:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    @pytest.mark.parametrize('orientation,max_width,original,final', [
+        (None, 200, (1600, 1200), (200, 150)),
+        (6, 150, (1200, 1600), (150, 200)),
+    ])
+    def test_jpeg_downscale_decodes_at_reduced_scale(self, orientation, max_width, original, final):
+        data = make_jpeg(size=(1600, 1200), orientation=orientation)
+        validation = self.compressor.validate_image(data)
+
+        _, metadata = self.compressor.compress_image(
+            data, 'web', max_width=max_width, preloaded_image=validation.image)
+
+        # libjpeg decoded at 1/4 scale, keeping 2x headroom over the target
+        assert validation.image.size == (400, 300)
+        assert metadata['original_dimensions'] == original
+        assert metadata['final_dimensions'] == final
+
+    def test_jpeg_small_downscale_keeps_full_decode(self):
+        data = make_jpeg(size=(1600, 1200))
+        validation = self.compressor.validate_image(data)
+
+        _, metadata = self.compressor.compress_image(
+            data, 'web', max_width=1000, preloaded_image=validation.image)
+
+        assert validation.image.size == (1600, 1200)
+        assert metadata['final_dimensions'] == (1000, 750)
+
+
+class TestRemoveTransparency:
+
+    @pytest.fixture(autouse=True)
+    def _compressor(self):
+        self.compressor = ImageCompressor(max_file_size_mb=50)
+
+    def test_rgba_composites_over_white(self):
+        img = Image.new('RGBA', (2, 1), (0, 0, 0, 0))
+        img.putpixel((1, 0), (0, 0, 0, 255))
+
+        result = self.compressor._remove_transparency(img)
+
+        assert result.mode == 'RGB'
+        assert result.getpixel((0, 0)) == (255, 255, 255)
+        assert result.getpixel((1, 0)) == (0, 0, 0)
+
+    def test_la_composites_over_white(self):
+        img = Image.new('LA', (1, 1), (0, 128))
+
+        result = self.compressor._remove_transparency(img)
+
+        assert result.mode == 'RGB'
+        assert result.getpixel((0, 0)) == (127, 127, 127)
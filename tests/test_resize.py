@@ -3,6 +3,9 @@ import io
 import pytest
 from PIL import Image
 
+from app.compression.image_processor import ImageCompressor
+from app.routes import _get_resize_filter
+
 
 def make_png(size=(800, 600), color=(64, 128, 192)):
     image = Image.new('RGB', size, color)
@@ -147,6 +150,7 @@ def test_process_png_custom_resize_requires_a_dimension(auth_client):
     ('max_width', '400.5'),
     ('max_height', '1e3'),
     ('max_width', '-10'),
+    ('max_width', '\u0664\u0660\u0660'),
 ])
 def test_process_png_rejects_malformed_resize_dimensions(auth_client, field, value):
     response = post_process(auth_client, make_png(), resize_mode='custom', **{field: value})
@@ -164,3 +168,41 @@ def test_process_png_rejects_out_of_range_resize_dimensions(auth_client, field,
 
     assert response.status_code == 400
     assert response.get_json() == {'error': error}
+
+
+def test_process_reports_resize_error_before_quality_error(auth_client):
+    response = post_process(auth_client, make_png(), resize_mode='custom', max_width='0', quality='0')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Width must be between 1 and 10000 px.'}
+
+
+def test_compressor_uses_configured_resize_filter():
+    image = Image.new('RGB', (40, 40), (0, 0, 0))
+    image.paste((255, 255, 255), (0, 0, 20, 40))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+
+    compressor = ImageCompressor(max_file_size_mb=50, resize_filter=Image.Resampling.NEAREST)
+    compressed, metadata = compressor.compress_image(buffer.getvalue(), 'lossless', max_width=15)
+
+    resized = Image.open(io.BytesIO(compressed))
+    assert metadata['final_dimensions'] == (15, 15)
+    assert {color for _, color in resized.getcolors()} == {(0, 0, 0), (255, 255, 255)}
+
+
+@pytest.mark.parametrize('value,expected', [
+    (None, Image.Resampling.LANCZOS),
+    ('bilinear', Image.Resampling.BILINEAR),
+    (' Hamming ', Image.Resampling.HAMMING),
+    ('not-a-filter', Image.Resampling.LANCZOS),
+    ('nearest', Image.Resampling.LANCZOS),
+    ('box', Image.Resampling.LANCZOS),
+])
+def test_resize_filter_from_environment(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv('RESIZE_FILTER', raising=False)
+    else:
+        monkeypatch.setenv('RESIZE_FILTER', value)
+
+    assert _get_resize_filter() is expected